@@ -1,7 +1,7 @@
 """Configuration for pjsk plugin."""
 
 import os
-from typing import List, Optional
+from typing import Optional, Tuple
 
 # Default configuration values
 DEFAULT_CONFIG = {
@@ -12,36 +12,48 @@ DEFAULT_CONFIG = {
 }
 
 # Asset prefixes (not configurable via WebUI for simplicity)
-PJSK_ASSETS_PREFIX: List[str] = [
+PJSK_ASSETS_PREFIX: Tuple[str, ...] = (
     "https://raw.githubusercontent.com/TheOriginalAyaka/sekai-stickers/main/",
-]
+)
 
-PJSK_REPO_PREFIX: List[str] = [
+PJSK_REPO_PREFIX: Tuple[str, ...] = (
     "https://raw.githubusercontent.com/Agnes4m/nonebot_plugin_pjsk/main/",
-]
+)
+
+
+# Resolved proxy, cached as (resolved, value) after the first lookup
+_proxy_cache: Tuple[bool, Optional[str]] = (False, None)
 
 
 def get_proxy_from_env() -> Optional[str]:
     """Get proxy from environment variables.
 
-    Checks common proxy environment variables in order:
+    Checks common proxy environment variables in order, preferring the
+    uppercase name and falling back to the lowercase one:
     - HTTPS_PROXY / https_proxy (for HTTPS requests)
     - HTTP_PROXY / http_proxy (fallback)
     - ALL_PROXY / all_proxy (catch-all)
+
+    The result is cached until `invalidate_proxy_cache()` is called.
     """
-    proxy_vars = [
-        "HTTPS_PROXY",
-        "https_proxy",
-        "HTTP_PROXY",
-        "http_proxy",
-        "ALL_PROXY",
-        "all_proxy",
-    ]
-    for var in proxy_vars:
-        proxy = os.environ.get(var)
+    global _proxy_cache
+    resolved, proxy = _proxy_cache
+    if resolved:
+        return proxy
+
+    proxy = None
+    for var in ("HTTPS_PROXY", "HTTP_PROXY", "ALL_PROXY"):
+        proxy = os.environ.get(var) or os.environ.get(var.lower())
         if proxy:
-            return proxy
-    return None
+            break
+    _proxy_cache = (True, proxy or None)
+    return _proxy_cache[1]
+
+
+def invalidate_proxy_cache():
+    """Forget the cached proxy so the next lookup re-reads the environment."""
+    global _proxy_cache
+    _proxy_cache = (False, None)
 
 
 class PluginConfig:
@@ -54,6 +66,7 @@ class PluginConfig:
         """Update configuration with new values."""
         if config_dict:
             self._config = config_dict
+        invalidate_proxy_cache()
     
     @property
     def pjsk_req_retry(self) -> int:
@@ -75,17 +88,17 @@ class PluginConfig:
     def pjsk_req_proxy(self) -> Optional[str]:
         """Get proxy for requests.
 
-        Dynamically reads environment variable proxy to ensure AstrBot's
-        proxy settings are picked up after core initialization.
+        Reads the environment variable proxy lazily (and caches it) to ensure
+        AstrBot's proxy settings are picked up after core initialization.
         """
         return get_proxy_from_env()
 
     @property
-    def pjsk_assets_prefix(self) -> List[str]:
+    def pjsk_assets_prefix(self) -> Tuple[str, ...]:
         return PJSK_ASSETS_PREFIX
 
     @property
-    def pjsk_repo_prefix(self) -> List[str]:
+    def pjsk_repo_prefix(self) -> Tuple[str, ...]:
         return PJSK_REPO_PREFIX
 
 
@@ -3,10 +3,9 @@ Sekai Stickers - Project Sekai 表情包制作插件 for AstrBot
 """
 
 import math
-import os
-import tempfile
 from typing import Optional
 
+import astrbot.api.message_components as Comp
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
@@ -18,6 +17,7 @@ from .render import (
     DEFAULT_STROKE_WIDTH,
     close_browser,
     get_all_characters_grid,
+    get_browser_context,
     get_character_stickers_grid,
     get_sticker,
     make_sticker_render_kwargs,
@@ -53,57 +53,46 @@ Project Sekai 表情生成
 """.strip()
 
 
+# Command flags mapped to the key they fill in the parsed arguments
+_FLAG_TO_KEY = {
+    "-i": "id",
+    "--id": "id",
+    "-x": "x",
+    "-y": "y",
+    "-r": "rotate",
+    "--rotate": "rotate",
+    "-s": "size",
+    "--size": "size",
+    "-c": "color",
+    "--color": "color",
+    "-W": "stroke_width",
+    "--stroke-width": "stroke_width",
+    "-C": "stroke_color",
+    "--stroke-color": "stroke_color",
+    "-S": "line_spacing",
+    "--line-spacing": "line_spacing",
+}
+
+_DEFAULT_ARGS = dict.fromkeys(_FLAG_TO_KEY.values())
+
+
 def parse_args(args_str: str) -> dict:
     """Parse command arguments."""
-    result = {
-        "text": [],
-        "id": None,
-        "x": None,
-        "y": None,
-        "rotate": None,
-        "size": None,
-        "color": None,
-        "stroke_width": None,
-        "stroke_color": None,
-        "line_spacing": None,
-    }
+    result = _DEFAULT_ARGS.copy()
+    result["text"] = []
 
     parts = args_str.split()
     i = 0
     while i < len(parts):
         part = parts[i]
-        if part in ("-i", "--id") and i + 1 < len(parts):
-            result["id"] = parts[i + 1]
-            i += 2
-        elif part == "-x" and i + 1 < len(parts):
-            result["x"] = parts[i + 1]
-            i += 2
-        elif part == "-y" and i + 1 < len(parts):
-            result["y"] = parts[i + 1]
-            i += 2
-        elif part in ("-r", "--rotate") and i + 1 < len(parts):
-            result["rotate"] = parts[i + 1]
-            i += 2
-        elif part in ("-s", "--size") and i + 1 < len(parts):
-            result["size"] = parts[i + 1]
-            i += 2
-        elif part in ("-c", "--color") and i + 1 < len(parts):
-            result["color"] = parts[i + 1]
-            i += 2
-        elif part in ("-W", "--stroke-width") and i + 1 < len(parts):
-            result["stroke_width"] = parts[i + 1]
-            i += 2
-        elif part in ("-C", "--stroke-color") and i + 1 < len(parts):
-            result["stroke_color"] = parts[i + 1]
+        key = _FLAG_TO_KEY.get(part)
+        if key and i + 1 < len(parts):
+            result[key] = parts[i + 1]
             i += 2
-        elif part in ("-S", "--line-spacing") and i + 1 < len(parts):
-            result["line_spacing"] = parts[i + 1]
-            i += 2
-        elif not part.startswith("-"):
+            continue
+        if not part.startswith("-"):
             result["text"].append(part)
-            i += 1
-        else:
-            i += 1
+        i += 1
 
     return result
 
@@ -138,6 +127,11 @@ class PJSKPlugin(Star):
             await self._ensure_playwright_browser()
             # Download resources
             await prepare_resource()
+            # Launch the browser now so the first render doesn't pay for it
+            try:
+                await get_browser_context()
+            except Exception as e:
+                logger.warning(f"预启动浏览器失败，将在首次生成时重试: {e}")
             self._initialized = True
             logger.info(
                 f"PJSK 表情插件初始化完成，加载了 {len(LOADED_STICKER_INFO)} 个表情"
@@ -146,30 +140,76 @@ class PJSKPlugin(Star):
             logger.error(f"PJSK 表情插件初始化失败: {e}")
             raise
 
+    @staticmethod
+    def _is_chromium_installed() -> bool:
+        """Check the Playwright browser registry for the pinned chromium.
+
+        Each Playwright release pins one browser revision (listed in its
+        bundled browsers.json), so only that exact revision counts; folders
+        left over from an older Playwright do not.
+        """
+        import json
+        import os
+        import platform
+        from pathlib import Path
+
+        import playwright
+
+        package_dir = Path(playwright.__file__).parent / "driver" / "package"
+        try:
+            browsers = json.loads((package_dir / "browsers.json").read_text("u8"))
+        except (OSError, ValueError):
+            return False
+
+        browsers_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+        if browsers_path == "0":
+            # Browsers installed next to the playwright package itself
+            root = package_dir / ".local-browsers"
+        elif browsers_path:
+            root = Path(browsers_path)
+        elif platform.system() == "Windows":
+            root = Path(os.environ.get("LOCALAPPDATA", Path.home())) / "ms-playwright"
+        elif platform.system() == "Darwin":
+            root = Path.home() / "Library" / "Caches" / "ms-playwright"
+        else:
+            root = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+            root = root / "ms-playwright"
+
+        # Headless launches use chromium-headless-shell on Playwright >= 1.49,
+        # and `playwright install chromium` installs both
+        required = [
+            x
+            for x in browsers.get("browsers", [])
+            if x.get("name") in ("chromium", "chromium-headless-shell")
+        ]
+        if not required:
+            return False
+
+        for browser in required:
+            # Some platforms pin a different revision via revisionOverrides
+            revisions = {browser["revision"]}
+            revisions.update(browser.get("revisionOverrides", {}).values())
+            dir_prefix = browser["name"].replace("-", "_")
+            # Playwright writes this marker once a browser download has finished
+            if not any(
+                (root / f"{dir_prefix}-{rev}" / "INSTALLATION_COMPLETE").exists()
+                for rev in revisions
+            ):
+                return False
+        return True
+
     async def _ensure_playwright_browser(self):
         """Install playwright chromium browser if not installed."""
         import asyncio
+        import shutil
         import sys
-        import platform
 
-        try:
-            # Check if chromium is already installed by trying to import and check
-            from playwright.async_api import async_playwright
-
-            async with async_playwright() as p:
-                # Try to get browser executable path
-                try:
-                    browser = await p.chromium.launch()
-                    await browser.close()
-                    logger.debug("Playwright chromium 已安装")
-                    return
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        if self._is_chromium_installed():
+            logger.debug("Playwright chromium 已安装")
+            return
 
-        # On Linux, install system dependencies first
-        if platform.system() == "Linux":
+        # On Debian-family Linux, install system dependencies first
+        if shutil.which("apt-get"):
             logger.info("正在安装 Playwright 系统依赖...")
             try:
                 proc = await asyncio.create_subprocess_exec(
@@ -225,11 +265,7 @@ class PJSKPlugin(Star):
         # Get command arguments
         message = event.message_str
         # Remove command prefix and command name
-        args_str = message
-        for prefix in ["/pjsk", "pjsk"]:
-            if args_str.startswith(prefix):
-                args_str = args_str[len(prefix) :].strip()
-                break
+        args_str = message.removeprefix("/").removeprefix("pjsk").strip()
 
         # Check for help
         if args_str in ("-h", "--help", "帮助"):
@@ -261,9 +297,7 @@ class PJSKPlugin(Star):
                 x=resolve_value(args["x"], default_text.x),
                 y=resolve_value(args["y"], default_text.y),
                 rotate=resolve_value(
-                    args["rotate"],
-                    lambda: math.degrees(default_text.r / 10),
-                    float,
+                    args["rotate"], math.degrees(default_text.r / 10), float
                 ),
                 font_size=resolve_value(args["size"], default_text.s),
                 font_color=args["color"] or selected_sticker.color,
@@ -283,20 +317,8 @@ class PJSKPlugin(Star):
             yield event.plain_result("生成表情时出错，请检查后台日志")
             return
 
-        # Save to temp file and send, then clean up
-        temp_path = os.path.join(
-            tempfile.gettempdir(), f"pjsk_{hash(text)}_{id(event)}.png"
-        )
-        try:
-            with open(temp_path, "wb") as f:
-                f.write(image_bytes)
-            yield event.image_result(temp_path)
-        finally:
-            # Clean up temporary file after sending
-            try:
-                os.remove(temp_path)
-            except OSError:
-                pass
+        # Send the image bytes directly, no temp file round-trip
+        yield event.chain_result([Comp.Image.fromBytes(image_bytes)])
 
     @filter.command("pjsk列表")
     async def pjsk_list(self, event: AstrMessageEvent):
@@ -307,11 +329,7 @@ class PJSKPlugin(Star):
 
         # Get character name if provided
         message = event.message_str
-        args_str = message
-        for prefix in ["/pjsk列表", "pjsk列表"]:
-            if args_str.startswith(prefix):
-                args_str = args_str[len(prefix) :].strip()
-                break
+        args_str = message.removeprefix("/").removeprefix("pjsk列表").strip()
 
         character = args_str.strip() if args_str else None
 
@@ -330,27 +348,12 @@ class PJSKPlugin(Star):
             yield event.plain_result("获取表情列表时出错，请检查后台日志")
             return
 
-        # Save to temp file and send, then clean up
-        temp_path = os.path.join(
-            tempfile.gettempdir(), f"pjsk_list_{character or 'all'}_{id(event)}.jpeg"
-        )
-        try:
-            with open(temp_path, "wb") as f:
-                f.write(image_bytes)
-
-            if character:
-                yield event.image_result(temp_path)
-            else:
-                yield event.image_result(temp_path)
-                yield event.plain_result(
-                    "使用 /pjsk列表 <角色名> 查看该角色的所有表情 ID"
-                )
-        finally:
-            # Clean up temporary file after sending
-            try:
-                os.remove(temp_path)
-            except OSError:
-                pass
+        # Send the image bytes directly, no temp file round-trip
+        yield event.chain_result([Comp.Image.fromBytes(image_bytes)])
+        if not character:
+            yield event.plain_result(
+                "使用 /pjsk列表 <角色名> 查看该角色的所有表情 ID"
+            )
 
     async def terminate(self):
         """Clean up when plugin is unloaded."""
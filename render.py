@@ -2,10 +2,13 @@
 
 import asyncio
 import math
+import zlib
+from functools import lru_cache
 from pathlib import Path
 from typing import Awaitable, Callable, Dict, List, Literal, Optional, TypedDict, Union
+from urllib.parse import unquote
 
-import anyio
+from jinja2 import Template
 from playwright.async_api import (
     async_playwright,
     Browser,
@@ -15,7 +18,6 @@ from playwright.async_api import (
     Request,
     Route,
 )
-from yarl import URL
 
 from .config import config
 from . import resource as res
@@ -38,6 +40,17 @@ DEFAULT_STROKE_COLOR = "#ffffff"
 ROUTER_BASE_URL = "https://pjsk.local/"
 PLUGIN_ROUTER_PREFIX = "plugin/"
 
+# Chromium features we never need for rendering small SVGs. No --no-sandbox
+# here: Playwright adds it already unless launched with chromium_sandbox=True,
+# which would break the root/Docker setups AstrBot commonly runs in
+BROWSER_LAUNCH_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-audio-output",
+    "--mute-audio",
+]
+
 
 # Global browser instance for reuse
 _playwright: Optional[Playwright] = None
@@ -45,6 +58,10 @@ _browser: Optional[Browser] = None
 _browser_context: Optional[BrowserContext] = None
 _browser_lock = asyncio.Lock()
 
+# Idle pages kept around for reuse
+PAGE_POOL_SIZE = 4
+_page_pool: List[Page] = []
+
 
 async def get_browser_context() -> BrowserContext:
     """Get or create a reusable browser context.
@@ -54,6 +71,14 @@ async def get_browser_context() -> BrowserContext:
     """
     global _playwright, _browser, _browser_context
 
+    # Fast path without the lock, which only needs to guard creation
+    if (
+        _browser_context is not None
+        and _browser is not None
+        and _browser.is_connected()
+    ):
+        return _browser_context
+
     async with _browser_lock:
         if _browser_context is not None and _browser is not None:
             # Check if browser is still connected
@@ -67,10 +92,13 @@ async def get_browser_context() -> BrowserContext:
             _playwright = await async_playwright().start()
 
         if _browser is None:
-            _browser = await _playwright.chromium.launch()
+            _browser = await _playwright.chromium.launch(args=BROWSER_LAUNCH_ARGS)
 
         # Create a new context with device_scale_factor
         _browser_context = await _browser.new_context(device_scale_factor=1)
+        # Set up routing for local files once, every page inherits it
+        await _browser_context.route(f"{ROUTER_BASE_URL}**/*", file_router)
+        await _browser_context.route(ROUTER_BASE_URL, root_router)
         return _browser_context
 
 
@@ -79,6 +107,9 @@ async def close_browser() -> None:
     global _playwright, _browser, _browser_context
 
     async with _browser_lock:
+        # Pages are closed together with their context
+        _page_pool.clear()
+
         if _browser_context is not None:
             try:
                 await _browser_context.close()
@@ -101,10 +132,16 @@ async def close_browser() -> None:
             _playwright = None
 
 
+def calc_text_width_unit(text: str) -> float:
+    """Calculate text width at font size 1 (full-width chars count as 1)."""
+    full_width = sum(map(is_full_width, text))
+    return full_width + (len(text) - full_width) / 2
+
+
 def calc_approximate_text_width(text: str, size: int, rotate_deg: float) -> float:
     """Calculate approximate text width considering rotation."""
     rotate_rad = math.radians(rotate_deg)
-    width = sum((size if is_full_width(x) else size / 2) for x in text)
+    width = calc_text_width_unit(text) * size
     return abs(width * math.cos(rotate_rad)) + abs(size * math.sin(rotate_rad))
 
 
@@ -117,11 +154,15 @@ def auto_adjust_font_size(
     multiplier: float = 1.2,
 ) -> int:
     """Auto-adjust font size to fit within width."""
-    while size > min_size:
-        if (calc_approximate_text_width(text, size, rotate_deg) * multiplier) <= width:
-            break
-        size -= 1
-    return size
+    # Rotated width is linear in size, so solve for the largest fitting size
+    rotate_rad = math.radians(rotate_deg)
+    factor = calc_text_width_unit(text) * abs(math.cos(rotate_rad)) + abs(
+        math.sin(rotate_rad)
+    )
+    if size <= min_size or factor <= 0:
+        return size
+    max_fit_size = math.floor(width / (factor * multiplier))
+    return max(min_size, min(size, max_fit_size))
 
 
 async def root_router(route: Route):
@@ -131,18 +172,19 @@ async def root_router(route: Route):
 
 async def file_router(route: Route, request: Request):
     """Handle file routes by serving local files from data or plugin dir."""
-    url = URL(request.url)
-    url_path = url.path[1:]  # Remove leading /
+    # Every routed URL starts with ROUTER_BASE_URL, so slice instead of parsing
+    url_path = request.url[len(ROUTER_BASE_URL) :].split("?", 1)[0].split("#", 1)[0]
+    url_path = unquote(url_path)
 
     # Check if this is a plugin directory file (bundled fonts, etc.)
     if url_path.startswith(PLUGIN_ROUTER_PREFIX):
         relative = url_path[len(PLUGIN_ROUTER_PREFIX) :]
-        path = anyio.Path(res.PLUGIN_DIR / relative)
+        path = res.PLUGIN_DIR / relative
     else:
-        path = anyio.Path(res.DATA_FOLDER / url_path)
+        path = res.DATA_FOLDER / url_path
 
     try:
-        data = await path.read_bytes()
+        data = await res.read_local_file(path)
     except Exception:
         return await route.abort()
     return await route.fulfill(body=data)
@@ -169,6 +211,18 @@ def to_router_url(path: Union[str, Path]) -> str:
         return f"{ROUTER_BASE_URL}{path.name}"
 
 
+@lru_cache(maxsize=None)
+def get_sticker_image_url(img: str) -> str:
+    """Get router URL of a sticker image, computed once per image."""
+    return to_router_url(res.RESOURCE_FOLDER / img)
+
+
+@lru_cache(maxsize=1)
+def get_font_url() -> str:
+    """Get router URL of the font, computed once after resources are ready."""
+    return to_router_url(res.FONT_PATH)
+
+
 class StickerRenderKwargs(TypedDict):
     """Arguments for sticker rendering."""
 
@@ -210,7 +264,7 @@ def make_sticker_render_kwargs(
         else qor(font_size, default_text.s)
     )
     return {
-        "image": to_router_url(res.RESOURCE_FOLDER / info.img),
+        "image": get_sticker_image_url(info.img),
         "x": qor(x, default_text.x),
         "y": qor(y, default_text.y),
         "text": text,
@@ -220,30 +274,64 @@ def make_sticker_render_kwargs(
         "stroke_color": qor(stroke_color, DEFAULT_STROKE_COLOR),
         "stroke_width": qor(stroke_width, DEFAULT_STROKE_WIDTH),
         "line_spacing": qor(line_spacing, DEFAULT_LINE_SPACING),
-        "font": to_router_url(res.FONT_PATH),
+        "font": get_font_url(),
         "width": DEFAULT_WIDTH,
         "height": DEFAULT_HEIGHT,
     }
 
 
+@lru_cache(maxsize=8)
+def get_template(name: str) -> Template:
+    """Get a template, resolving it from the environment only once."""
+    return JINJA_ENV.get_template(name)
+
+
 async def render_sticker_html(**kwargs) -> str:
     """Render sticker SVG HTML."""
-    template = JINJA_ENV.get_template("sticker.svg.jinja")
-    return await template.render_async(id=hash(kwargs["image"]), **kwargs)
+    template = get_template("sticker.svg.jinja")
+    # Stable across restarts, unlike the salted builtin hash()
+    pattern_id = zlib.crc32(kwargs["image"].encode())
+    return await template.render_async(id=pattern_id, **kwargs)
 
 
 async def render_sticker_grid_html(items: List[str]) -> str:
     """Render sticker grid HTML."""
-    template = JINJA_ENV.get_template("sticker_grid.html.jinja")
+    template = get_template("sticker_grid.html.jinja")
     return await template.render_async(items=items)
 
 
 async def render_help_html(text: str) -> str:
     """Render help HTML."""
-    template = JINJA_ENV.get_template("help.html.jinja")
+    template = get_template("help.html.jinja")
     return await template.render_async(text=text)
 
 
+async def acquire_page() -> Page:
+    """Take an idle page from the pool, or create a new one."""
+    context = await get_browser_context()
+    while _page_pool:
+        page = _page_pool.pop()
+        if not page.is_closed() and page.context is context:
+            return page
+
+    page = await context.new_page()
+    # Give the document the router origin so the @font-face load is
+    # same-origin; pooled pages keep it, so this runs once per page
+    await page.goto(ROUTER_BASE_URL)
+    return page
+
+
+async def release_page(page: Page) -> None:
+    """Return a page to the pool, closing it if the pool is already full."""
+    if len(_page_pool) < PAGE_POOL_SIZE and not page.is_closed():
+        _page_pool.append(page)
+        return
+    try:
+        await page.close()
+    except Exception:
+        pass
+
+
 async def capture_with_playwright(
     html: str,
     selector: str,
@@ -253,26 +341,25 @@ async def capture_with_playwright(
 ) -> bytes:
     """Capture element screenshot using playwright.
 
-    Uses a reusable browser context for better performance.
-    Only creates a new page for each render, avoiding browser launch overhead.
+    Uses a small pool of reusable pages for better performance,
+    avoiding page setup and browser launch overhead on every render.
     """
-    context = await get_browser_context()
-    page = await context.new_page()
+    page = await acquire_page()
 
     try:
-        # Set up routing for local files
-        await page.route(f"{ROUTER_BASE_URL}**/*", file_router)
-        await page.route(ROUTER_BASE_URL, root_router)
-
-        await page.goto(ROUTER_BASE_URL)
         await page.set_content(html)
 
         element = await page.wait_for_selector(selector)
         assert element
         img = await element.screenshot(type=image_type, omit_background=omit_background)
-    finally:
-        # Always close the page to free resources
-        await page.close()
+    except BaseException:
+        # Don't hand a page in an unknown state back to the pool
+        try:
+            await page.close()
+        except Exception:
+            pass
+        raise
+    await release_page(page)
 
     if config.pjsk_use_cache and cache_key:
         await write_cache(f"{cache_key}.{image_type}", img)
@@ -295,20 +382,57 @@ async def capture_template(html: str, cache_key: Optional[str] = None) -> bytes:
     return await capture_with_playwright(html, ".main-wrapper", cache_key=cache_key)
 
 
+async def capture_stickers_batch(
+    html: str,
+    selectors: List[str],
+    cache_keys: Optional[List[str]] = None,
+) -> List[bytes]:
+    """Capture several stickers from one page as PNGs.
+
+    The page is set up once and each sticker is screenshotted by selector,
+    instead of paying for a full page load per sticker.
+    """
+    page = await acquire_page()
+
+    try:
+        await page.set_content(html)
+
+        images = [
+            await page.locator(selector).screenshot(type="png", omit_background=True)
+            for selector in selectors
+        ]
+    except BaseException:
+        # Don't hand a page in an unknown state back to the pool
+        try:
+            await page.close()
+        except Exception:
+            pass
+        raise
+    await release_page(page)
+
+    if config.pjsk_use_cache and cache_keys:
+        for cache_key, img in zip(cache_keys, images):
+            await write_cache(f"{cache_key}.png", img)
+    return images
+
+
 def use_cache(cache_key_func: Union[str, Callable], ext: Literal["png", "jpeg"]):
     """Decorator to add caching to render functions."""
 
     def decorator(func: Callable[..., Awaitable[bytes]]):
         async def wrapper(*args, **kwargs):
+            # No key needed when caching is off, the result is never stored
+            if not config.pjsk_use_cache:
+                return await func("", *args, **kwargs)
+
             key = (
                 cache_key_func(*args, **kwargs)
                 if callable(cache_key_func)
                 else cache_key_func
             )
-            if config.pjsk_use_cache:
-                cached = await get_cache(f"{key}.{ext}")
-                if cached:
-                    return cached
+            cached = await get_cache(f"{key}.{ext}")
+            if cached:
+                return cached
             return await func(key, *args, **kwargs)
 
         return wrapper
@@ -318,7 +442,8 @@ def use_cache(cache_key_func: Union[str, Callable], ext: Literal["png", "jpeg"])
 
 def get_sticker_cache_key_maker(**params) -> str:
     """Generate cache key for sticker."""
-    return make_cache_key(params)
+    # The font is the same for every sticker of an install
+    return make_cache_key({k: v for k, v in params.items() if k != "font"})
 
 
 @use_cache(get_sticker_cache_key_maker, "png")
@@ -327,6 +452,29 @@ async def get_sticker(key: str, **params) -> bytes:
     return await capture_sticker(await render_sticker_html(**params), cache_key=key)
 
 
+async def get_stickers_batch(params_list: List[StickerRenderKwargs]) -> List[bytes]:
+    """Get several rendered sticker images, rendering the uncached ones together."""
+    images: Dict[int, bytes] = {}
+    keys: Optional[List[str]] = None
+    if config.pjsk_use_cache:
+        keys = [get_sticker_cache_key_maker(**params) for params in params_list]
+        for i, key in enumerate(keys):
+            cached = await get_cache(f"{key}.png")
+            if cached:
+                images[i] = cached
+
+    missing = [i for i in range(len(params_list)) if i not in images]
+    if missing:
+        svgs = [await render_sticker_html(**params_list[i]) for i in missing]
+        rendered = await capture_stickers_batch(
+            "".join(svgs),
+            [f"body > svg:nth-of-type({n})" for n in range(1, len(svgs) + 1)],
+            cache_keys=[keys[i] for i in missing] if keys else None,
+        )
+        images.update(zip(missing, rendered))
+    return [images[i] for i in range(len(params_list))]
+
+
 @use_cache(lambda text: "help", "jpeg")
 async def get_help(key: str, text: str) -> bytes:
     """Get rendered help image."""
@@ -338,21 +486,15 @@ async def get_all_characters_grid(key: str) -> bytes:
     """Get all characters grid image."""
     character_dict: Dict[str, StickerInfo] = {}
     for info in LOADED_STICKER_INFO:
-        character = info.character
-        if character not in character_dict:
-            character = (
-                character
-                if character[0].isupper()
-                else character[0].upper() + character[1:]
-            )
-            character_dict[character] = info
-
-    sticker_templates = await asyncio.gather(
-        *(
-            render_sticker_html(**make_sticker_render_kwargs(info, char))
-            for char, info in character_dict.items()
-        ),
-    )
+        # Keep the first sticker of each character, keyed by capitalized name
+        character = info.character[:1].upper() + info.character[1:]
+        character_dict.setdefault(character, info)
+
+    # Rendering is pure CPU work, so await in turn instead of spawning tasks
+    sticker_templates = [
+        await render_sticker_html(**make_sticker_render_kwargs(info, char))
+        for char, info in character_dict.items()
+    ]
     return await capture_template(
         await render_sticker_grid_html(sticker_templates),
         cache_key=key,
@@ -367,14 +509,12 @@ def get_character_stickers_grid_cache_key_maker(character: str) -> str:
 @use_cache(get_character_stickers_grid_cache_key_maker, "jpeg")
 async def get_character_stickers_grid(key: str, character: str) -> bytes:
     """Get character stickers grid image."""
-    character = character.lower()
-    sticker_templates = await asyncio.gather(
-        *(
-            render_sticker_html(**make_sticker_render_kwargs(info, info.sticker_id))
-            for info in LOADED_STICKER_INFO
-            if info.character.lower() == character
-        ),
-    )
+    character = character.casefold()
+    sticker_templates = [
+        await render_sticker_html(**make_sticker_render_kwargs(info, info.sticker_id))
+        for info in LOADED_STICKER_INFO
+        if info.character_key == character
+    ]
     return await capture_template(
         await render_sticker_grid_html(sticker_templates),
         cache_key=key,
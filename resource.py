@@ -1,18 +1,20 @@
 """Resource management for pjsk plugin."""
 
 import asyncio
-import json
+import hashlib
+import os
 import random
-from contextlib import suppress
+from functools import cached_property
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Coroutine, List, Optional, overload
+from typing import Any, Dict, List, Optional, Set, Tuple, overload
 
-import anyio
 import jinja2
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, Field, TypeAdapter
 
 from .config import config
-from .utils import ResponseType, append_prefix, async_request, with_semaphore
+from .utils import append_prefix, async_download, async_request
 
 # Plugin directory
 PLUGIN_DIR = Path(__file__).parent
@@ -24,6 +26,7 @@ RESOURCE_FOLDER: Optional[Path] = None
 STICKER_INFO_CACHE: Optional[Path] = None
 CACHE_FOLDER: Optional[Path] = None
 FONT_PATH: Optional[Path] = None
+_directories_ready = False
 
 # Try to use bundled font first
 BUNDLED_FONT_PATH = PLUGIN_DIR / "fonts" / "YurukaFangTang.ttf"
@@ -34,9 +37,18 @@ JINJA_ENV = jinja2.Environment(
     loader=jinja2.FileSystemLoader(TEMPLATES_FOLDER),
     autoescape=jinja2.select_autoescape(["html", "xml"]),
     enable_async=True,
+    # Templates are bundled and never change at runtime
+    auto_reload=False,
+    cache_size=400,
 )
 
 
+def preload_templates():
+    """Compile all bundled templates into the environment cache."""
+    for path in TEMPLATES_FOLDER.glob("**/*.jinja"):
+        JINJA_ENV.get_template(path.relative_to(TEMPLATES_FOLDER).as_posix())
+
+
 def init_data_folder(data_dir: Path = None):
     """Initialize data folder paths. Called from main.py with StarTools.get_data_dir()."""
     global \
@@ -45,7 +57,8 @@ def init_data_folder(data_dir: Path = None):
         RESOURCE_FOLDER, \
         STICKER_INFO_CACHE, \
         CACHE_FOLDER, \
-        FONT_PATH
+        FONT_PATH, \
+        _directories_ready
 
     if data_dir:
         DATA_FOLDER = data_dir
@@ -57,6 +70,9 @@ def init_data_folder(data_dir: Path = None):
     RESOURCE_FOLDER = DATA_FOLDER / "resource"
     STICKER_INFO_CACHE = DATA_FOLDER / "characters.json"
     CACHE_FOLDER = DATA_FOLDER / "cache"
+    _directories_ready = False
+
+    preload_templates()
 
     # Use bundled font if exists, otherwise use data folder
     FONT_PATH = (
@@ -67,42 +83,91 @@ def init_data_folder(data_dir: Path = None):
 
 
 def make_cache_key(obj: Any) -> str:
-    """Generate cache key from object."""
-    with suppress(Exception):
-        return str(hash(obj))
-    return str(hash(json.dumps(obj)))
+    """Generate cache key from object.
+
+    Uses a digest of the JSON encoding rather than `hash()`, which is salted
+    per process and would make the on-disk cache useless across restarts.
+    """
+    data = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def clear_cache_folder():
+    """Remove every file in the cache folder."""
+    for f in CACHE_FOLDER.iterdir():
+        f.unlink(missing_ok=True)
 
 
 async def ensure_directories():
-    """Ensure all required directories exist."""
+    """Ensure all required directories exist, once per data folder."""
+    global _directories_ready
+    if _directories_ready:
+        return
+
     for folder in (DATA_FOLDER, FONT_FOLDER, RESOURCE_FOLDER, CACHE_FOLDER):
-        if not folder.exists():
-            folder.mkdir(parents=True)
+        folder.mkdir(parents=True, exist_ok=True)
 
     # Clear cache if configured
-    if config.pjsk_clear_cache and CACHE_FOLDER.exists():
-        for f in CACHE_FOLDER.iterdir():
-            f.unlink()
+    if config.pjsk_clear_cache:
+        await asyncio.to_thread(clear_cache_folder)
+    _directories_ready = True
+
+
+def get_cache_sync(filename: str) -> Optional[bytes]:
+    """Get cached file content, blocking the calling thread."""
+    # Just try the read, a miss fails on open without a separate exists check
+    try:
+        return (CACHE_FOLDER / filename).read_bytes()
+    except OSError:
+        return None
+
+
+def write_cache_sync(filename: str, data: bytes):
+    """Write data to cache, blocking the calling thread."""
+    try:
+        (CACHE_FOLDER / filename).write_bytes(data)
+    except Exception:
+        pass
 
 
 async def get_cache(filename: str) -> Optional[bytes]:
     """Get cached file content."""
-    path = anyio.Path(CACHE_FOLDER / filename)
-    if await path.exists():
-        try:
-            return await path.read_bytes()
-        except Exception:
-            pass
-    return None
+    return await asyncio.to_thread(get_cache_sync, filename)
 
 
 async def write_cache(filename: str, data: bytes):
     """Write data to cache."""
-    path = anyio.Path(CACHE_FOLDER / filename)
-    try:
-        await path.write_bytes(data)
-    except Exception:
-        pass
+    await asyncio.to_thread(write_cache_sync, filename, data)
+
+
+# In-memory copies of local files served to the renderer, evicted FIFO
+FILE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+_file_cache: Dict[str, bytes] = {}
+_file_cache_size = 0
+
+
+def _put_file_cache(key: str, data: bytes):
+    """Store file content in memory, evicting the oldest entries if needed."""
+    global _file_cache_size
+    # Concurrent misses on the same file may both try to insert it
+    if key in _file_cache or len(data) > FILE_CACHE_MAX_BYTES:
+        return
+    while _file_cache and _file_cache_size + len(data) > FILE_CACHE_MAX_BYTES:
+        _file_cache_size -= len(_file_cache.pop(next(iter(_file_cache))))
+    _file_cache[key] = data
+    _file_cache_size += len(data)
+
+
+async def read_local_file(path: Path) -> bytes:
+    """Read a local file, keeping its content in memory for later reads."""
+    key = str(path)
+    data = _file_cache.get(key)
+    if data is not None:
+        return data
+    data = await asyncio.to_thread(path.read_bytes)
+    if config.pjsk_use_cache:
+        _put_file_cache(key, data)
+    return data
 
 
 class StickerText(BaseModel):
@@ -125,15 +190,30 @@ class StickerInfo(BaseModel):
     color: str
     default_text: StickerText = Field(..., alias="defaultText")
 
+    @cached_property
+    def character_key(self) -> str:
+        """Casefolded character name, for sorting and case-insensitive matching."""
+        return self.character.casefold()
+
+
+STICKER_INFO_ADAPTER = TypeAdapter(List[StickerInfo])
 
 LOADED_STICKER_INFO: List[StickerInfo] = []
 
+# Index of loaded stickers by their assigned ID
+_STICKER_BY_ID: Dict[str, StickerInfo] = {}
+
+# Parsed sticker info, keyed by (path, mtime, size) of the file it came from
+_sticker_info_cache: Dict[Tuple[str, int, int], List[StickerInfo]] = {}
+
 
 def sort_stickers():
-    """Sort stickers by character name and assign IDs."""
-    LOADED_STICKER_INFO.sort(key=lambda x: x.character.lower())
+    """Sort stickers by character name, assign IDs and index them."""
+    LOADED_STICKER_INFO.sort(key=attrgetter("character_key"))
     for i, x in enumerate(LOADED_STICKER_INFO, 1):
         x.sticker_id = str(i)
+    _STICKER_BY_ID.clear()
+    _STICKER_BY_ID.update((x.sticker_id, x) for x in LOADED_STICKER_INFO)
 
 
 @overload
@@ -146,13 +226,26 @@ def select_or_get_random(sticker_id: str) -> Optional[StickerInfo]: ...
 
 def select_or_get_random(sticker_id: Optional[str] = None) -> Optional[StickerInfo]:
     """Select sticker by ID or get a random one."""
-    return (
-        next((x for x in LOADED_STICKER_INFO if sticker_id == x.sticker_id), None)
-        if sticker_id
-        else random.choice(LOADED_STICKER_INFO)
-        if LOADED_STICKER_INFO
-        else None
-    )
+    if sticker_id:
+        return _STICKER_BY_ID.get(sticker_id)
+    count = len(LOADED_STICKER_INFO)
+    return LOADED_STICKER_INFO[random.randrange(count)] if count else None
+
+
+# Downloads share one semaphore so concurrency stays bounded across calls
+DOWNLOAD_CONCURRENCY = 20
+_download_semaphore: Optional[asyncio.BoundedSemaphore] = None
+_download_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_download_semaphore() -> asyncio.BoundedSemaphore:
+    """Get the shared download semaphore, recreating it for a new event loop."""
+    global _download_semaphore, _download_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _download_semaphore is None or _download_semaphore_loop is not loop:
+        _download_semaphore = asyncio.BoundedSemaphore(DOWNLOAD_CONCURRENCY)
+        _download_semaphore_loop = loop
+    return _download_semaphore
 
 
 async def check_and_download_font():
@@ -163,50 +256,81 @@ async def check_and_download_font():
 
     if not FONT_PATH.exists():
         font_name = FONT_PATH.name
-        path = anyio.Path(FONT_FOLDER) / font_name
+        path = FONT_FOLDER / font_name
         urls = append_prefix(f"fonts/{font_name}", config.pjsk_repo_prefix)
-        await path.write_bytes(await async_request(*urls))
+        async with get_download_semaphore():
+            await async_download(*urls, path=path)
+
+
+def file_content_equals(path: Path, data: bytes) -> bool:
+    """Check whether a file exists and holds exactly the given bytes."""
+    try:
+        return path.stat().st_size == len(data) and path.read_bytes() == data
+    except OSError:
+        return False
 
 
 async def load_sticker_info():
     """Load sticker information from remote or cache."""
     await ensure_directories()
 
-    path = anyio.Path(STICKER_INFO_CACHE)
+    path = STICKER_INFO_CACHE
     urls = append_prefix("src/characters.json", config.pjsk_assets_prefix)
     try:
-        loaded_text = await async_request(*urls, response_type=ResponseType.TEXT)
-        await path.write_text(loaded_text, encoding="u8")
+        loaded = await async_request(*urls)
+        # Leave the file (and its mtime) alone when nothing changed
+        if not await asyncio.to_thread(file_content_equals, path, loaded):
+            await asyncio.to_thread(path.write_bytes, loaded)
     except Exception:
-        if not (await path.exists()):
+        if not path.exists():
             raise
-        loaded_text = await path.read_text(encoding="u8")
-
-    LOADED_STICKER_INFO.clear()
-    data = json.loads(loaded_text)
-    for item in data:
-        LOADED_STICKER_INFO.append(StickerInfo.model_validate(item))
+        loaded = await asyncio.to_thread(path.read_bytes)
+
+    # Skip parsing and validation when the file is unchanged since last load
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    infos = _sticker_info_cache.get(key)
+    if infos is None:
+        infos = STICKER_INFO_ADAPTER.validate_python(orjson.loads(loaded))
+        _sticker_info_cache.clear()
+        _sticker_info_cache[key] = infos
+
+    LOADED_STICKER_INFO[:] = infos
     sort_stickers()
 
 
+def list_existing_files(folder: Path) -> Set[str]:
+    """List files under a folder as POSIX paths relative to it."""
+    existing: Set[str] = set()
+    for root, _, files in os.walk(folder):
+        relative_root = Path(root).relative_to(folder)
+        existing.update((relative_root / f).as_posix() for f in files)
+    return existing
+
+
 async def check_and_download_stickers():
     """Download missing sticker images."""
-    semaphore = asyncio.Semaphore(10)
+    semaphore = get_download_semaphore()
 
-    @with_semaphore(semaphore)
     async def download(path_str: str):
-        path = anyio.Path(RESOURCE_FOLDER) / path_str
-        if not (await (dir_name := path.parent).exists()):
-            await dir_name.mkdir(parents=True, exist_ok=True)
-
         urls = append_prefix(f"public/img/{path_str}", config.pjsk_assets_prefix)
-        await path.write_bytes(await async_request(*urls))
-
-    tasks: List[Coroutine] = [
-        download(sticker_info.img)
-        for sticker_info in LOADED_STICKER_INFO
-        if not (RESOURCE_FOLDER / sticker_info.img).exists()
-    ]
+        await async_download(*urls, path=RESOURCE_FOLDER / path_str)
+
+    # One directory walk instead of a stat call per sticker
+    existing = list_existing_files(RESOURCE_FOLDER)
+    missing = [x.img for x in LOADED_STICKER_INFO if x.img not in existing]
+
+    # Create every target directory once up front, not once per download
+    for dir_name in {(RESOURCE_FOLDER / img).parent for img in missing}:
+        dir_name.mkdir(parents=True, exist_ok=True)
+
+    # Acquire before creating each task to bound how many downloads exist at once
+    tasks: List[asyncio.Task] = []
+    for img in missing:
+        await semaphore.acquire()
+        task = asyncio.create_task(download(img))
+        task.add_done_callback(lambda _: semaphore.release())
+        tasks.append(task)
     if tasks:
         await asyncio.gather(*tasks)
 
@@ -224,3 +348,6 @@ async def prepare_resource():
         check_and_download_resource(),
         check_and_download_font(),
     )
+    # The font is requested by every render, so keep it in memory up front
+    if config.pjsk_use_cache:
+        await read_local_file(FONT_PATH)
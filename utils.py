@@ -1,24 +1,24 @@
 """Utility functions for pjsk plugin."""
 
 import unicodedata
-from asyncio import Semaphore
 from enum import Enum, auto
 from functools import lru_cache
+from pathlib import Path
 from typing import (
     Any,
-    Awaitable,
     Callable,
     Iterable,
-    List,
     Literal,
     Optional,
     Sequence,
+    Tuple,
     Type,
     TypeVar,
     Union,
     overload,
 )
 
+import anyio
 from httpx import AsyncClient, Limits
 
 from .config import config
@@ -35,8 +35,10 @@ def get_http_client() -> AsyncClient:
         _http_client = AsyncClient(
             proxy=config.pjsk_req_proxy,
             timeout=config.pjsk_req_timeout,
+            # Sticker downloads hit one host, so multiplex them over HTTP/2
+            http2=True,
             limits=Limits(
-                max_connections=50,
+                max_connections=20,
                 max_keepalive_connections=20,
                 keepalive_expiry=30.0,
             ),
@@ -56,7 +58,6 @@ T = TypeVar("T")
 TN = TypeVar("TN", int, float)
 TA = TypeVar("TA")
 TB = TypeVar("TB")
-R = TypeVar("R")
 
 
 class ResponseType(Enum):
@@ -96,52 +97,70 @@ async def async_request(
 ) -> Any:
     """Async HTTP request with retry and fallback URLs.
 
+    Each URL is tried `retries + 1` times before falling back to the next.
     Uses a global HTTP client with connection pooling for better performance.
     """
     if not urls:
         raise ValueError("No URL specified")
 
-    url, rest = urls[0], urls[1:]
-    try:
-        client = get_http_client()
-        response = await client.get(url)
-        response.raise_for_status()
-        if response_type == ResponseType.JSON:
-            return response.json()
-        if response_type == ResponseType.TEXT:
-            return response.text
-        return response.read()
-
-    except Exception as e:
-        err_suffix = (
-            f"error occurred while requesting {url}: {e.__class__.__name__}: {e}"
-        )
-        if retries <= 0:
-            if not rest:
-                raise
-            # Try next URL
-            return await async_request(*rest, response_type=response_type)
-
-        retries -= 1
-        return await async_request(*urls, response_type=response_type, retries=retries)
+    client = get_http_client()
+    last_exc: Optional[Exception] = None
+    for url in urls:
+        for _ in range(max(retries, 0) + 1):
+            try:
+                response = await client.get(url)
+                response.raise_for_status()
+                if response_type == ResponseType.JSON:
+                    return response.json()
+                if response_type == ResponseType.TEXT:
+                    return response.text
+                return response.read()
+            except Exception as e:
+                last_exc = e
+
+    assert last_exc
+    raise last_exc
+
+
+async def async_download(
+    *urls: str,
+    path: Path,
+    retries: int = config.pjsk_req_retry,
+    chunk_size: int = 65536,
+) -> None:
+    """Stream a file to disk with retry and fallback URLs.
 
+    The body is written to a temporary file in chunks and moved into place
+    once complete, so a failed download never leaves a partial file behind.
+    """
+    if not urls:
+        raise ValueError("No URL specified")
 
-def append_prefix(suffix: str, prefixes: Sequence[str]) -> List[str]:
+    client = get_http_client()
+    temp_path = anyio.Path(path.with_name(f"{path.name}.part"))
+    last_exc: Optional[Exception] = None
+    for url in urls:
+        for _ in range(max(retries, 0) + 1):
+            try:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async with await anyio.open_file(temp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            await f.write(chunk)
+                await temp_path.replace(path)
+                return
+            except Exception as e:
+                last_exc = e
+
+    await temp_path.unlink(missing_ok=True)
+    assert last_exc
+    raise last_exc
+
+
+@lru_cache(maxsize=4096)
+def append_prefix(suffix: str, prefixes: Tuple[str, ...]) -> Tuple[str, ...]:
     """Append suffix to each prefix."""
-    return [prefix + suffix for prefix in prefixes]
-
-
-def with_semaphore(semaphore: Semaphore):
-    """Decorator to limit concurrency using semaphore."""
-
-    def decorator(func: Callable[..., Awaitable[R]]):
-        async def wrapper(*args, **kwargs) -> R:
-            async with semaphore:
-                return await func(*args, **kwargs)
-
-        return wrapper
-
-    return decorator
+    return tuple(prefix + suffix for prefix in prefixes)
 
 
 def chunks(iterable: Sequence[T], size: int) -> Iterable[Sequence[T]]:
@@ -168,12 +187,12 @@ def resolve_value(
 
     if not value:
         return get_default()
+    relative = value[0] == "^"
     try:
-        if value.startswith("^"):
-            return get_default() + expected_type(value[1:])
-        return expected_type(value)
+        parsed = expected_type(value[1:] if relative else value)
     except Exception as e:
         raise ResolveValueError(value) from e
+    return get_default() + parsed if relative else parsed
 
 
 def qor(a: Optional[TA], b: Union[TB, Callable[[], TB]]) -> Union[TA, TB]:
@@ -181,7 +200,7 @@ def qor(a: Optional[TA], b: Union[TB, Callable[[], TB]]) -> Union[TA, TB]:
     return a if (a is not None) else (b() if callable(b) else b)
 
 
-@lru_cache()
+@lru_cache(maxsize=65536)
 def is_full_width(char: str) -> bool:
     """Check if a character is full-width."""
     return unicodedata.east_asian_width(char) in ("A", "F", "W")